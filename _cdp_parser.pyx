@@ -0,0 +1,110 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Optional C-accelerated parser for 'show cdp neighbors detail' output.
+Mirrors the line-oriented parser in DataParser.parse_cdp_neighbors.
+
+Build in place with: cythonize -i _cdp_parser.pyx
+DataParser falls back to its pure-Python parser when this is not built.
+"""
+
+from libc.string cimport memchr, memcmp
+
+cdef const char* DEVICE_ID = b'Device ID:'
+cdef const char* IP_ADDRESS = b'IP address:'
+cdef const char* IPV4_ADDRESS = b'IPv4 address:'
+cdef const char* PLATFORM = b'Platform:'
+cdef const char* INTERFACE = b'Interface:'
+cdef const char* REMOTE_PORT = b'Port ID (outgoing port):'
+
+
+cdef inline bint _is_space(char c) noexcept:
+    return c == c' ' or c == c'\t' or c == c'\r' or c == c'\n' or c == c'\f' or c == c'\v'
+
+
+cdef inline bint _starts_with(const char* start, const char* stop,
+                              const char* prefix, Py_ssize_t prefix_len) noexcept:
+    return stop - start >= prefix_len and memcmp(start, prefix, prefix_len) == 0
+
+
+cdef const char* _find(const char* start, const char* stop,
+                       const char* needle, Py_ssize_t needle_len) noexcept:
+    """Return a pointer to the first occurrence of needle, or NULL."""
+    cdef const char* p = start
+    while stop - p >= needle_len:
+        p = <const char*>memchr(p, needle[0], stop - p - needle_len + 1)
+        if p == NULL:
+            return NULL
+        if memcmp(p, needle, needle_len) == 0:
+            return p
+        p += 1
+    return NULL
+
+
+cdef str _value(const char* start, const char* stop, bint until_comma):
+    """Decode a stripped field value, optionally cut at the first comma."""
+    cdef const char* comma
+    if until_comma:
+        comma = <const char*>memchr(start, c',', stop - start)
+        if comma != NULL:
+            stop = comma
+    while start < stop and _is_space(start[0]):
+        start += 1
+    while stop > start and _is_space(stop[-1]):
+        stop -= 1
+    return start[:stop - start].decode('utf-8', 'replace')
+
+
+def parse_cdp_fast(str output):
+    """
+    Parse 'show cdp neighbors detail' output.
+
+    Args:
+        output: String output from the command
+
+    Returns:
+        List of dictionaries containing neighbor information
+    """
+    cdef bytes data = output.encode('utf-8')
+    cdef const char* p = data
+    cdef const char* end = p + len(data)
+    cdef const char* start
+    cdef const char* stop
+    cdef const char* found
+    cdef dict neighbor = {}
+    cdef list entries = [neighbor]
+
+    while p < end:
+        stop = <const char*>memchr(p, c'\n', end - p)
+        if stop == NULL:
+            stop = end
+        start = p
+        p = stop + 1
+
+        while start < stop and _is_space(start[0]):
+            start += 1
+        while stop > start and _is_space(stop[-1]):
+            stop -= 1
+
+        if _starts_with(start, stop, b'---', 3):
+            neighbor = {}
+            entries.append(neighbor)
+            continue
+
+        if _starts_with(start, stop, DEVICE_ID, 10):
+            neighbor.setdefault('device_id', _value(start + 10, stop, False))
+        elif _starts_with(start, stop, IP_ADDRESS, 11):
+            neighbor.setdefault('ip', _value(start + 11, stop, False))
+        elif _starts_with(start, stop, IPV4_ADDRESS, 13):
+            neighbor.setdefault('ip', _value(start + 13, stop, False))
+        elif _starts_with(start, stop, PLATFORM, 9):
+            neighbor.setdefault('platform', _value(start + 9, stop, True))
+        elif _starts_with(start, stop, INTERFACE, 10):
+            neighbor.setdefault('local_interface', _value(start + 10, stop, True))
+
+        # The remote port usually shares a line with the local interface
+        found = _find(start, stop, REMOTE_PORT, 24)
+        if found != NULL:
+            neighbor.setdefault('remote_interface', _value(found + 24, stop, False))
+
+    # Only add if we have essential information
+    return [n for n in entries if n.get('device_id') and n.get('ip')]
@@ -5,9 +5,63 @@ Parses output from show commands to extract structured data.
 """
 
 import re
+import zlib
 import logging
 from typing import Dict, List, Any, Optional
 
+# Optional C-accelerated CDP parser (see _cdp_parser.pyx)
+try:
+    from _cdp_parser import parse_cdp_fast
+except ImportError:
+    parse_cdp_fast = None
+
+# CDP field prefixes, matched line by line
+_CDP_IP_PREFIXES = ('IP address:', 'IPv4 address:')
+_CDP_REMOTE_PORT_PREFIX = 'Port ID (outgoing port):'
+
+# LLDP patterns
+# The split captures each block's Device ID, used when System Name is empty
+_LLDP_BLOCK_SPLIT_RE = re.compile(r'[\r\n][\r\n]Device ID:(.+?)[\r\n]')
+# Values stop at the end of their own line, so an empty field cannot
+# swallow the field on the next line
+_LLDP_FIELDS_RE = re.compile(
+    r'System Name:[ \t]*(?P<device_id>.+?)[\r\n]'
+    r'|Management Address:[ \t]*(?P<ip>.+?)[\r\n]'
+    r'|Local Interface:[ \t]*(?P<local_interface>.+?)[\r\n]'
+    r'|Port ID:[ \t]*(?P<remote_interface>.+?)[\r\n]'
+)
+
+# Version patterns
+_VERSION_MODEL_RE = re.compile(r'(?:cisco|Cisco)\s+(\S+)(?:\s+\S+){0,3}\s+processor')
+_VERSION_IOS_RE = re.compile(r'Cisco IOS Software.*Version\s+([^,\s]+)')
+_VERSION_HOSTNAME_RE = re.compile(r'(\S+)\s+uptime\s+is')
+
+def compress_results(results: Dict[str, str]) -> Dict[str, bytes]:
+    """
+    Compress raw command outputs for keeping them in memory.
+    
+    Args:
+        results: Dictionary mapping each command to its output
+        
+    Returns:
+        Dictionary mapping each command to its zlib-compressed output
+    """
+    return {command: zlib.compress(output.encode('utf-8'), 1)
+            for command, output in results.items()}
+
+def decompress_results(compressed: Dict[str, bytes]) -> Dict[str, str]:
+    """
+    Restore raw command outputs compressed by compress_results().
+    
+    Args:
+        compressed: Dictionary mapping each command to its compressed output
+        
+    Returns:
+        Dictionary mapping each command to its output
+    """
+    return {command: zlib.decompress(output).decode('utf-8')
+            for command, output in compressed.items()}
+
 class DataParser:
     """Parses raw command outputs into structured data."""
     
@@ -15,6 +69,27 @@ class DataParser:
         """Initialize the DataParser with an optional logger."""
         self.logger = logger or logging.getLogger(__name__)
     
+    @staticmethod
+    def _extract_fields(pattern: re.Pattern, block: str) -> Dict[str, str]:
+        """
+        Extract fields from a neighbor block in a single regex pass.
+        
+        Args:
+            pattern: Compiled alternation whose named groups are field names
+            block: Text of a single neighbor entry
+            
+        Returns:
+            Dictionary mapping field names to the first non-empty value found
+        """
+        fields = {}
+        for match in pattern.finditer(block):
+            field = match.lastgroup
+            if field not in fields:
+                value = match.group(field).strip()
+                if value:
+                    fields[field] = value
+        return fields
+    
     def parse_cdp_neighbors(self, output: str) -> List[Dict[str, str]]:
         """
         Parse the output of 'show cdp neighbors detail' command.
@@ -25,50 +100,41 @@ class DataParser:
         Returns:
             List of dictionaries containing neighbor information
         """
-        neighbors = []
-        
         # If output is already parsed by TextFSM
-        if isinstance(output, list):
+        if type(output) is list:
             return output
         
-        # Manual parsing for cases where TextFSM fails
-        device_blocks = re.split(r'-{3,}', output)
+        if parse_cdp_fast is not None:
+            return parse_cdp_fast(output)
         
-        for block in device_blocks:
-            if not block.strip():
-                continue
-                
-            neighbor = {}
+        # Manual parsing for cases where TextFSM fails: a single pass over
+        # the lines, starting a new entry at each '-----' separator
+        entries = [{}]
+        
+        for line in output.splitlines():
+            line = line.strip()
+            neighbor = entries[-1]
             
-            # Extract device ID
-            device_id_match = re.search(r'Device ID:[\s]*(.+?)[\r\n]', block)
-            if device_id_match:
-                neighbor['device_id'] = device_id_match.group(1).strip()
+            if line.startswith('---'):
+                entries.append({})
+                continue
             
-            # Extract IP address
-            ip_match = re.search(r'IP(?:v4)? address:[\s]*(.+?)[\r\n]', block)
-            if ip_match:
-                neighbor['ip'] = ip_match.group(1).strip()
-                
-            # Extract platform
-            platform_match = re.search(r'Platform:[\s]*(.+?),', block)
-            if platform_match:
-                neighbor['platform'] = platform_match.group(1).strip()
-                
-            # Extract interface information
-            local_int_match = re.search(r'Interface:[\s]*(.+?),', block)
-            remote_int_match = re.search(r'Port ID \(outgoing port\):[\s]*(.+?)[\r\n]', block)
+            if line.startswith('Device ID:'):
+                neighbor.setdefault('device_id', line.partition(':')[2].strip())
+            elif line.startswith(_CDP_IP_PREFIXES):
+                neighbor.setdefault('ip', line.partition(':')[2].strip())
+            elif line.startswith('Platform:'):
+                neighbor.setdefault('platform', line.partition(':')[2].partition(',')[0].strip())
+            elif line.startswith('Interface:'):
+                neighbor.setdefault('local_interface', line.partition(':')[2].partition(',')[0].strip())
             
-            if local_int_match:
-                neighbor['local_interface'] = local_int_match.group(1).strip()
-            if remote_int_match:
-                neighbor['remote_interface'] = remote_int_match.group(1).strip()
-                
-            # Only add if we have essential information
-            if neighbor.get('device_id') and neighbor.get('ip'):
-                neighbors.append(neighbor)
+            # The remote port usually shares a line with the local interface
+            _, found, remote_port = line.partition(_CDP_REMOTE_PORT_PREFIX)
+            if found:
+                neighbor.setdefault('remote_interface', remote_port.strip())
         
-        return neighbors
+        # Only add if we have essential information
+        return [n for n in entries if n.get('device_id') and n.get('ip')]
     
     def parse_lldp_neighbors(self, output: str) -> List[Dict[str, str]]:
         """
@@ -81,39 +147,25 @@ class DataParser:
             List of dictionaries containing neighbor information
         """
         # If output is already parsed by TextFSM
-        if isinstance(output, list):
+        if type(output) is list:
             return output
         
         neighbors = []
         # Similar parsing logic to CDP but adapted for LLDP format
         # This is a simplified version - would need enhancement for production
         
-        device_blocks = re.split(r'[\r\n][\r\n]Device ID:.+?[\r\n]', output)
+        # The split alternates blocks with the Device ID that opened them;
+        # text before the first Device ID line has none
+        parts = _LLDP_BLOCK_SPLIT_RE.split(output)
+        device_blocks = zip([''] + parts[1::2], parts[0::2])
         
-        for block in device_blocks:
+        for header_id, block in device_blocks:
             if not block.strip():
                 continue
                 
-            neighbor = {}
-            
-            # Extract device ID
-            device_id_match = re.search(r'System Name:[\s]*(.+?)[\r\n]', block)
-            if device_id_match:
-                neighbor['device_id'] = device_id_match.group(1).strip()
-            
-            # Extract IP address
-            ip_match = re.search(r'Management Address:[\s]*(.+?)[\r\n]', block)
-            if ip_match:
-                neighbor['ip'] = ip_match.group(1).strip()
-                
-            # Extract interface information
-            local_int_match = re.search(r'Local Interface:[\s]*(.+?)[\r\n]', block)
-            remote_int_match = re.search(r'Port ID:[\s]*(.+?)[\r\n]', block)
-            
-            if local_int_match:
-                neighbor['local_interface'] = local_int_match.group(1).strip()
-            if remote_int_match:
-                neighbor['remote_interface'] = remote_int_match.group(1).strip()
+            neighbor = self._extract_fields(_LLDP_FIELDS_RE, block)
+            if 'device_id' not in neighbor and header_id.strip():
+                neighbor['device_id'] = header_id.strip()
                 
             # Only add if we have essential information
             if neighbor.get('device_id') and neighbor.get('ip'):
@@ -132,7 +184,7 @@ class DataParser:
             Dictionary of interfaces with their details
         """
         # If output is already parsed by TextFSM
-        if isinstance(output, list):
+        if type(output) is list:
             interface_dict = {}
             for intf in output:
                 interface_dict[intf.get('interface', 'unknown')] = intf
@@ -152,26 +204,28 @@ class DataParser:
             Dictionary containing version and hardware information
         """
         # If output is already parsed by TextFSM
-        if isinstance(output, dict) or isinstance(output, list):
-            if isinstance(output, list) and len(output) > 0:
-                return output[0]
+        # TextFSM returns plain lists, so an identity check is sufficient
+        output_type = type(output)
+        if output_type is list:
+            return output[0] if output else {}
+        if output_type is dict:
             return output
         
         # Manual parsing for when TextFSM fails
         version_info = {}
         
         # Extract model
-        model_match = re.search(r'(?:cisco|Cisco)\s+(\S+)(?:\s+\S+){0,3}\s+processor', output)
+        model_match = _VERSION_MODEL_RE.search(output)
         if model_match:
             version_info['hardware'] = model_match.group(1)
         
         # Extract IOS version
-        version_match = re.search(r'Cisco IOS Software.*Version\s+([^,\s]+)', output)
+        version_match = _VERSION_IOS_RE.search(output)
         if version_match:
             version_info['version'] = version_match.group(1)
         
         # Extract hostname
-        hostname_match = re.search(r'(\S+)\s+uptime\s+is', output)
+        hostname_match = _VERSION_HOSTNAME_RE.search(output)
         if hostname_match:
             version_info['hostname'] = hostname_match.group(1)
             
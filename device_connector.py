@@ -4,22 +4,58 @@ Device connector module for Cisco network discovery tool.
 Handles SSH connections and command execution on network devices.
 """
 
+import os
+import re
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+import textfsm
+from textfsm import clitable
 from netmiko import ConnectHandler, NetmikoTimeoutException, NetmikoAuthenticationException
-from typing import List, Dict, Any, Optional
+from netmiko.utilities import get_template_dir
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+# Prefixes of IOS error messages for rejected commands
+CLI_ERROR_MARKERS = ('% Invalid', '% Incomplete', '% Ambiguous')
 
 class DeviceConnector:
     """Handles connections to network devices and executes commands."""
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
-        """Initialize the DeviceConnector with an optional logger."""
+    # Compiled TextFSM templates keyed by (platform, command), shared by all
+    # instances. None marks a command without a matching template.
+    _TEMPLATE_CACHE: Dict[Tuple[str, str], Optional[textfsm.TextFSM]] = {}
+    _template_lock = threading.Lock()
+    
+    # Device parameters used by this tool that are not passed to netmiko
+    TOOL_PARAMS = ('inter_command_delay',)
+    
+    # Seconds to wait for each command's output
+    COMMAND_READ_TIMEOUT = 30
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, keepalive_timeout: float = 30.0):
+        """
+        Initialize the DeviceConnector.
+        
+        Args:
+            logger: Optional logger instance
+            keepalive_timeout: Seconds a session kept by disconnect(reuse=True)
+                               may be handed out again
+        """
         self.logger = logger or logging.getLogger(__name__)
+        self.keepalive_timeout = keepalive_timeout
+        
+        # Idle sessions keyed by (host, username), with the time each was released
+        self._pool: Dict[Tuple[str, str], Tuple[float, ConnectHandler]] = {}
+        self._pool_lock = threading.Lock()
     
     def connect(self, device_params: Dict[str, Any]) -> Optional[ConnectHandler]:
         """
         Establish a connection to a network device.
         
+        A live session kept by disconnect(reuse=True) for the same device
+        and user is handed out instead of opening a new one.
+        
         Args:
             device_params: Dictionary with device connection parameters
                           (device_type, ip, username, password, etc.)
@@ -27,9 +63,18 @@ class DeviceConnector:
         Returns:
             ConnectHandler object if successful, None otherwise
         """
+        # Netmiko takes the host from 'ip', falling back to 'host'
+        pool_key = (device_params.get('ip') or device_params.get('host'), device_params.get('username'))
+        connection = self._checkout(pool_key)
+        if connection:
+            self.logger.info(f"Reusing connection to {device_params.get('ip')}")
+            return connection
+        
+        netmiko_params = {key: value for key, value in device_params.items()
+                          if key not in self.TOOL_PARAMS}
         try:
             self.logger.info(f"Connecting to {device_params.get('ip', 'Unknown device')}")
-            connection = ConnectHandler(**device_params)
+            connection = ConnectHandler(**netmiko_params)
             self.logger.info(f"Successfully connected to {device_params.get('ip')}")
             return connection
         except NetmikoTimeoutException:
@@ -40,8 +85,29 @@ class DeviceConnector:
             self.logger.error(f"Failed to connect to {device_params.get('ip')}: {str(e)}")
         return None
     
-    def execute_commands(self, connection: ConnectHandler, commands: List[str], 
-                         parse_output: bool = False) -> Dict[str, str]:
+    def _checkout(self, pool_key: Tuple[str, str]) -> Optional[ConnectHandler]:
+        """
+        Take a kept session out of the pool if it is still usable.
+        
+        Args:
+            pool_key: (host, username) of the wanted session
+            
+        Returns:
+            ConnectHandler object, or None if no usable session is kept
+        """
+        with self._pool_lock:
+            entry = self._pool.pop(pool_key, None)
+        if entry is None:
+            return None
+        
+        released_at, connection = entry
+        if time.monotonic() - released_at <= self.keepalive_timeout and connection.is_alive():
+            return connection
+        self._close(connection)
+        return None
+    
+    def execute_commands(self, connection: ConnectHandler, commands: Sequence[str], 
+                         parse_output: bool = False, pace_seconds: float = 0.0) -> Dict[str, str]:
         """
         Execute a list of commands on a connected device.
         
@@ -49,28 +115,199 @@ class DeviceConnector:
             connection: Active ConnectHandler object
             commands: List of commands to execute
             parse_output: Whether to attempt to use TextFSM parsing
+            pace_seconds: Optional delay between commands for devices that
+                          cannot keep up with back-to-back commands
             
         Returns:
             Dictionary mapping each command to its output
         """
         results = {}
         
-        for command in commands:
-            try:
+        if not connection.is_alive():
+            self.logger.error("Connection is not alive, skipping commands")
+            return {command: "ERROR: connection is not alive" for command in commands}
+        
+        # Show commands do not change the prompt, so look it up once
+        # rather than letting netmiko probe for it before every command
+        try:
+            prompt = re.escape(connection.find_prompt().strip())
+        except Exception as e:
+            self.logger.error(f"Error finding the device prompt, skipping commands: {str(e)}")
+            return {command: f"ERROR: prompt lookup failed: {str(e)}" for command in commands}
+        
+        try:
+            for command in commands:
                 self.logger.debug(f"Executing command: {command}")
-                if parse_output:
-                    output = connection.send_command(command, use_textfsm=True)
-                else:
-                    output = connection.send_command(command)
+                output = connection.send_command(command, expect_string=prompt,
+                                                 read_timeout=self.COMMAND_READ_TIMEOUT)
+                
+                # Devices report rejected commands in the output, not as exceptions
+                if self._is_cli_error(output):
+                    self.logger.warning(f"Device rejected '{command}': {output.strip()}")
+                elif parse_output:
+                    output = self._parse_with_textfsm(connection.device_type, command, output)
+                
                 results[command] = output
-                time.sleep(0.5)  # Small delay to prevent overwhelming the device
-            except Exception as e:
-                self.logger.error(f"Error executing '{command}': {str(e)}")
-                results[command] = f"ERROR: {str(e)}"
+                if pace_seconds:
+                    time.sleep(pace_seconds)
+        except Exception as e:
+            # The session is unusable after a transport error, so the
+            # remaining commands are reported as failed too
+            self.logger.error(f"Error executing '{command}': {str(e)}")
+            for remaining in commands:
+                results.setdefault(remaining, f"ERROR: {str(e)}")
         
         return results
     
-    def disconnect(self, connection: ConnectHandler) -> None:
+    @staticmethod
+    def _is_cli_error(output: str) -> bool:
+        """
+        Check whether command output is an IOS CLI error message.
+        
+        Args:
+            output: Raw command output
+            
+        Returns:
+            True if the device rejected the command
+        """
+        return any(marker in output for marker in CLI_ERROR_MARKERS)
+    
+    def _get_template(self, platform: str, command: str) -> Optional[textfsm.TextFSM]:
+        """
+        Look up and compile the ntc-templates TextFSM template for a command.
+        
+        Templates are compiled once per (platform, command) and cached.
+        Must be called with _template_lock held.
+        
+        Args:
+            platform: Netmiko device type, as used in the ntc-templates index
+            command: Command string
+            
+        Returns:
+            Compiled TextFSM object, or None if no template matches
+        """
+        key = (platform, command)
+        if key not in self._TEMPLATE_CACHE:
+            template_dir = get_template_dir()
+            cli_table = clitable.CliTable('index', template_dir)
+            row_idx = cli_table.index.GetRowMatch({'Platform': platform, 'Command': command})
+            
+            template = None
+            if row_idx:
+                template_name = cli_table.index.index[row_idx]['Template'].split(':')[0]
+                with open(os.path.join(template_dir, template_name)) as f:
+                    template = textfsm.TextFSM(f)
+            self._TEMPLATE_CACHE[key] = template
+        
+        return self._TEMPLATE_CACHE[key]
+    
+    def _parse_with_textfsm(self, platform: str, command: str,
+                            output: str) -> Union[str, List[Dict[str, str]]]:
+        """
+        Parse raw command output with a cached TextFSM template.
+        
+        Args:
+            platform: Netmiko device type of the connection
+            command: Command that produced the output
+            output: Raw command output
+            
+        Returns:
+            List of row dictionaries with lowercased keys, or the raw output
+            if no template matches or nothing could be parsed
+        """
+        command = command.strip()
+        with self._template_lock:
+            template = self._get_template(platform, command)
+            # IOS-XE shares most templates with IOS
+            if template is None and 'cisco_xe' in platform:
+                template = self._get_template('cisco_ios', command)
+            if template is None:
+                return output
+            
+            template.Reset()
+            rows = template.ParseText(output)
+            header = [name.lower() for name in template.header]
+        
+        return [dict(zip(header, row)) for row in rows] or output
+    
+    def execute_on_many(self, device_params_list: List[Dict[str, Any]], commands: List[str],
+                        parse_output: bool = False, max_workers: int = 32,
+                        keep_connections: bool = False) -> Dict[str, Dict[str, str]]:
+        """
+        Connect to several devices concurrently and execute commands on each.
+        
+        Args:
+            device_params_list: List of device connection parameter dictionaries
+            commands: List of commands to execute on every device
+            parse_output: Whether to attempt to use TextFSM parsing
+            max_workers: Maximum number of concurrent SSH sessions
+            keep_connections: Keep the sessions open for a later call on the
+                              same devices; the caller must then call close_all()
+            
+        Returns:
+            Dictionary mapping each device IP to its command results
+            (empty if the connection failed)
+        """
+        def _connect_and_run(device_params: Dict[str, Any]) -> Dict[str, str]:
+            connection = self.connect(device_params)
+            if not connection:
+                return {}
+            try:
+                return self.execute_commands(connection, commands, parse_output,
+                                             device_params.get('inter_command_delay', 0))
+            finally:
+                self.disconnect(connection, reuse=keep_connections)
+        
+        if not device_params_list:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(device_params_list)))) as executor:
+            all_results = executor.map(_connect_and_run, device_params_list)
+            return {params.get('ip'): results
+                    for params, results in zip(device_params_list, all_results)}
+    
+    def disconnect(self, connection: ConnectHandler, reuse: bool = False) -> None:
+        """
+        Disconnect from a network device, or keep the session for reuse.
+        
+        Kept sessions idle for longer than keepalive_timeout are closed here.
+        
+        Args:
+            connection: Active ConnectHandler object
+            reuse: Keep the session open for a later connect() to the same
+                   device and user; close_all() closes it if it is never reused
+        """
+        self._close_expired()
+        
+        # Sessions broken by a transport error are closed, not kept
+        if reuse and connection.is_alive():
+            pool_key = (connection.host, connection.username)
+            with self._pool_lock:
+                if pool_key not in self._pool:
+                    self._pool[pool_key] = (time.monotonic(), connection)
+                    self.logger.debug(f"Keeping connection to {connection.host} for reuse")
+                    return
+        self._close(connection)
+    
+    def _close_expired(self) -> None:
+        """Close kept sessions idle for longer than keepalive_timeout."""
+        cutoff = time.monotonic() - self.keepalive_timeout
+        with self._pool_lock:
+            expired = [pool_key for pool_key, (released_at, _) in self._pool.items()
+                       if released_at < cutoff]
+            connections = [self._pool.pop(pool_key)[1] for pool_key in expired]
+        for connection in connections:
+            self._close(connection)
+    
+    def close_all(self) -> None:
+        """Close every session kept for reuse."""
+        with self._pool_lock:
+            connections = [connection for _, connection in self._pool.values()]
+            self._pool.clear()
+        for connection in connections:
+            self._close(connection)
+    
+    def _close(self, connection: ConnectHandler) -> None:
         """
         Properly disconnect from a network device.
         
@@ -5,15 +5,102 @@ Creates visual network diagrams based on collected data.
 """
 
 import os
+import re
+import shutil
 import logging
+import functools
 import networkx as nx
+import matplotlib
+# Diagrams are only written to files, so skip GUI backend initialization
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import pyvis
+from jinja2 import Environment, FileSystemLoader, Template
 from pyvis.network import Network
 from typing import Dict, List, Any, Optional, Set, Tuple
 
+# Device type classifiers, checked in priority order against the lowercased
+# hardware model first and the lowercased hostname second
+_HARDWARE_TYPE_PATTERNS = (
+    ('switch', re.compile(r'cat|2960|3750|9300')),
+    ('router', re.compile(r'isr|4300|4400|1900|2900|3900')),
+    ('firewall', re.compile(r'asa|firepower')),
+)
+_HOSTNAME_TYPE_PATTERNS = (
+    ('switch', re.compile(r'sw')),
+    ('router', re.compile(r'rtr?')),
+    ('firewall', re.compile(r'fw')),
+)
+
+# Interactive diagrams are rendered from the pyvis HTML template directly.
+# The template variables and bundled lib/ assets match pyvis 0.3.x, which
+# is why requirements.txt pins pyvis>=0.3.2,<0.4.
+_PYVIS_TEMPLATE_DIR = os.path.join(os.path.dirname(pyvis.__file__), 'templates')
+_PYVIS_HEIGHT = "900px"
+_PYVIS_WIDTH = "100%"
+
+@functools.lru_cache(maxsize=None)
+def _pyvis_template() -> Template:
+    """Load and compile the pyvis HTML template once per process."""
+    env = Environment(loader=FileSystemLoader(_PYVIS_TEMPLATE_DIR))
+    return env.get_template('template.html')
+
+@functools.lru_cache(maxsize=None)
+def _pyvis_options_json() -> str:
+    """Serialize the physics and control-button options shared by all diagrams once."""
+    net = Network(height=_PYVIS_HEIGHT, width=_PYVIS_WIDTH, notebook=False, directed=False)
+    
+    # Configure physics
+    net.barnes_hut(spring_length=200)
+    
+    # Add filter control buttons
+    net.show_buttons(filter_=['physics'])
+    
+    return net.options.to_json()
+
+@functools.lru_cache(maxsize=4096)
+def _classify_device(hardware: str, hostname: str) -> str:
+    """
+    Classify a device from its hardware model and hostname.
+    
+    Classification is pure, so results are cached per unique pair.
+    
+    Args:
+        hardware: Hardware model string
+        hostname: Device hostname
+        
+    Returns:
+        String representing the device type
+    """
+    # Try to determine from model first, then from naming conventions
+    hardware = hardware.lower()
+    hostname = hostname.lower()
+    
+    for device_type, pattern in _HARDWARE_TYPE_PATTERNS:
+        if pattern.search(hardware):
+            return device_type
+    
+    for device_type, pattern in _HOSTNAME_TYPE_PATTERNS:
+        if pattern.search(hostname):
+            return device_type
+    
+    # Default to switch if can't determine
+    return 'switch'
+
 class DiagramGenerator:
     """Generates network diagrams from discovered topology."""
     
+    # Define colors for different device types in interactive diagrams
+    INTERACTIVE_COLOR_MAP = {
+        'router': '#FF6666',  # light red
+        'switch': '#66CC66',  # light green
+        'firewall': '#FFA500', # orange
+        'unknown': '#CCCCCC'  # light gray
+    }
+    
+    # Edge labels are skipped in static diagrams with this many edges or more
+    EDGE_LABEL_MAX_EDGES = 100
+    
     def __init__(self, logger: Optional[logging.Logger] = None):
         """Initialize the DiagramGenerator with an optional logger."""
         self.logger = logger or logging.getLogger(__name__)
@@ -32,7 +119,8 @@ class DiagramGenerator:
         # Add nodes (devices)
         for device_ip, device_data in devices.items():
             hostname = device_data.get('hostname', device_ip)
-            device_type = self._determine_device_type(device_data)
+            device_type = self._determine_device_type(device_data.get('hardware', ''),
+                                                      device_data.get('hostname', ''))
             
             # Create a label with both hostname and IP
             label = f"{hostname}\n{device_ip}"
@@ -52,7 +140,7 @@ class DiagramGenerator:
                     
                     if neighbor_ip and neighbor_ip in devices:
                         # Create a unique connection identifier
-                        connection_id = tuple(sorted([source_ip, neighbor_ip]))
+                        connection_id = (source_ip, neighbor_ip) if source_ip < neighbor_ip else (neighbor_ip, source_ip)
                         
                         # Only add if we haven't added this connection yet
                         if connection_id not in added_connections:
@@ -68,35 +156,18 @@ class DiagramGenerator:
         
         self.logger.info(f"Built graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
     
-    def _determine_device_type(self, device_data: Dict[str, Any]) -> str:
+    def _determine_device_type(self, hardware: str, hostname: str) -> str:
         """
         Determine the type of device based on available information.
         
         Args:
-            device_data: Dictionary containing device information
+            hardware: Hardware model string
+            hostname: Device hostname
             
         Returns:
             String representing the device type
         """
-        # Try to determine from model or other attributes
-        hardware = device_data.get('hardware', '').lower()
-        hostname = device_data.get('hostname', '').lower()
-        
-        if any(sw_type in hardware for sw_type in ['cat', '2960', '3750', '9300']):
-            return 'switch'
-        elif any(rt_type in hardware for rt_type in ['isr', '4300', '4400', '1900', '2900', '3900']):
-            return 'router'
-        elif any(fw_type in hardware for fw_type in ['asa', 'firepower']):
-            return 'firewall'
-        elif 'sw' in hostname:
-            return 'switch'
-        elif 'rt' in hostname or 'rtr' in hostname:
-            return 'router'
-        elif 'fw' in hostname:
-            return 'firewall'
-        
-        # Default to switch if can't determine
-        return 'switch'
+        return _classify_device(hardware, hostname)
     
     def generate_matplotlib_diagram(self, output_file: str, 
                                    filter_types: Optional[List[str]] = None) -> None:
@@ -109,14 +180,13 @@ class DiagramGenerator:
         """
         filtered_graph = self._apply_filters(filter_types)
         
-        plt.figure(figsize=(12, 10))
+        fig, ax = plt.subplots(figsize=(12, 10))
         
-        # Define positions using spring layout
+        # Define positions using spring layout. From 500 nodes networkx switches
+        # to its scipy.sparse Fruchterman-Reingold implementation, which is why
+        # scipy is a hard dependency.
         pos = nx.spring_layout(filtered_graph, seed=42)
         
-        # Draw nodes by device type with different colors
-        device_types = nx.get_node_attributes(filtered_graph, 'device_type')
-        
         # Define colors for different device types
         color_map = {
             'router': 'red',
@@ -125,40 +195,54 @@ class DiagramGenerator:
             'unknown': 'gray'
         }
         
-        # Draw nodes grouped by device type
-        for device_type, color in color_map.items():
-            nodes = [node for node, type_val in device_types.items() if type_val == device_type]
-            nx.draw_networkx_nodes(filtered_graph, pos, nodelist=nodes, node_color=color, node_size=500, alpha=0.8)
+        # Collect node colors, labels and present device types in one pass
+        node_list = []
+        node_colors = []
+        labels = {}
+        device_types = set()
+        for node, attr in filtered_graph.nodes(data=True):
+            device_type = attr.get('device_type', 'unknown')
+            node_list.append(node)
+            node_colors.append(color_map.get(device_type, color_map['unknown']))
+            labels[node] = attr.get('label', node)
+            device_types.add(device_type)
+        
+        # Draw all nodes in a single call, colored by device type
+        nx.draw_networkx_nodes(filtered_graph, pos, nodelist=node_list, node_color=node_colors, node_size=500, alpha=0.8, ax=ax)
         
         # Draw edges
-        nx.draw_networkx_edges(filtered_graph, pos, width=1.0, alpha=0.5)
+        nx.draw_networkx_edges(filtered_graph, pos, width=1.0, alpha=0.5, ax=ax)
         
         # Draw labels
-        labels = nx.get_node_attributes(filtered_graph, 'label')
-        nx.draw_networkx_labels(filtered_graph, pos, labels=labels, font_size=9)
+        nx.draw_networkx_labels(filtered_graph, pos, labels=labels, font_size=9, ax=ax)
         
-        # Draw edge labels with port information
-        edge_labels = nx.get_edge_attributes(filtered_graph, 'label')
-        nx.draw_networkx_edge_labels(filtered_graph, pos, edge_labels=edge_labels, font_size=8)
+        # Draw edge labels with port information, unless the graph is too
+        # dense for them to be readable
+        if filtered_graph.number_of_edges() < self.EDGE_LABEL_MAX_EDGES:
+            edge_labels = {(u, v): label for u, v, label in filtered_graph.edges(data='label') if label}
+            nx.draw_networkx_edge_labels(filtered_graph, pos, edge_labels=edge_labels, font_size=8, ax=ax)
         
         # Add legend
         legend_elements = [plt.Line2D([0], [0], marker='o', color='w', markerfacecolor=color, markersize=10, label=device_type)
-                          for device_type, color in color_map.items() if any(t == device_type for t in device_types.values())]
+                          for device_type, color in color_map.items() if device_type in device_types]
         
-        plt.legend(handles=legend_elements, loc='upper right')
+        ax.legend(handles=legend_elements, loc='upper right')
         
-        plt.title("Network Topology")
-        plt.axis('off')
-        plt.tight_layout()
+        ax.set_title("Network Topology")
+        ax.set_axis_off()
+        fig.tight_layout()
         
         # Save figure
         directory = os.path.dirname(output_file)
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
             
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        # tight_layout() already fits the axes to the figure, so
+        # bbox_inches='tight' would only add a second render pass
+        fig.savefig(output_file, dpi=300)
         self.logger.info(f"Saved matplotlib diagram to {output_file}")
-        plt.close()
+        fig.clf()
+        plt.close(fig)
     
     def generate_interactive_diagram(self, output_file: str, 
                                     filter_types: Optional[List[str]] = None) -> None:
@@ -171,75 +255,177 @@ class DiagramGenerator:
         """
         filtered_graph = self._apply_filters(filter_types)
         
-        # Create pyvis network
-        net = Network(height="900px", width="100%", notebook=False, directed=False)
-        
-        # Define colors for different device types
-        color_map = {
-            'router': '#FF6666',  # light red
-            'switch': '#66CC66',  # light green
-            'firewall': '#FFA500', # orange
-            'unknown': '#CCCCCC'  # light gray
-        }
-        
         # Add nodes with proper attributes
+        nodes = []
         for node, attr in filtered_graph.nodes(data=True):
-            device_type = attr.get('device_type', 'unknown')
-            label = attr.get('label', node)
-            device_data = attr.get('data', {})
-            
-            # Build a title (tooltip) with more info
-            title = f"<b>{label}</b><br>"
-            title += f"IP: {node}<br>"
-            title += f"Type: {device_type}<br>"
-            if 'version' in device_data:
-                title += f"Version: {device_data['version']}<br>"
-            if 'hardware' in device_data:
-                title += f"Model: {device_data['hardware']}<br>"
-            
-            net.add_node(node, 
-                         label=label, 
-                         title=title,
-                         color=color_map.get(device_type, color_map['unknown']))
+            nodes.append(self._build_node(node, attr.get('label', node),
+                                          attr.get('device_type', 'unknown'), attr.get('data', {})))
         
         # Add edges with interface information
+        edges = []
         for u, v, data in filtered_graph.edges(data=True):
-            local_intf = data.get('local_interface', '')
-            remote_intf = data.get('remote_interface', '')
+            edges.append(self._build_edge(u, v, data.get('local_interface', ''), data.get('remote_interface', '')))
+        
+        self._write_interactive_html(nodes, edges, output_file)
+    
+    def generate_interactive_diagram_direct(self, devices: Dict[str, Dict[str, Any]], output_file: str,
+                                           filter_types: Optional[List[str]] = None) -> None:
+        """
+        Generate an interactive HTML network diagram straight from device data.
+        
+        Like build_graph() followed by generate_interactive_diagram(), but
+        without building an intermediate networkx graph. Edge tooltips use the
+        interface names reported by each neighbor entry.
+        
+        Args:
+            devices: Dictionary of devices and their information
+            output_file: Path to save the output HTML file
+            filter_types: List of device types to include (None for all)
+        """
+        filter_set = set(filter_types) if filter_types else None
+        
+        # Add nodes, filtering by device type in the same pass
+        nodes = []
+        included = {}
+        for device_ip, device_data in devices.items():
+            device_type = self._determine_device_type(device_data.get('hardware', ''),
+                                                      device_data.get('hostname', ''))
+            if filter_set is not None and device_type not in filter_set:
+                continue
             
-            title = f"{local_intf} ⟷ {remote_intf}" if local_intf and remote_intf else ""
+            label = f"{device_data.get('hostname', device_ip)}\n{device_ip}"
+            nodes.append(self._build_node(device_ip, label, device_type, device_data))
+            included[device_ip] = device_data
+        
+        # Add edges between included devices, once per pair
+        edges = []
+        added_connections = set()
+        for source_ip, device_data in included.items():
+            for neighbor in device_data.get('neighbors', []):
+                neighbor_ip = neighbor.get('ip')
+                if neighbor_ip not in included:
+                    continue
+                
+                connection_id = (source_ip, neighbor_ip) if source_ip < neighbor_ip else (neighbor_ip, source_ip)
+                if connection_id in added_connections:
+                    continue
+                
+                edges.append(self._build_edge(source_ip, neighbor_ip, neighbor.get('local_interface', ''),
+                                              neighbor.get('remote_interface', '')))
+                added_connections.add(connection_id)
+        
+        self._write_interactive_html(nodes, edges, output_file)
+    
+    def _build_node(self, node: str, label: str, device_type: str,
+                    device_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build a vis.js node for the interactive diagram.
+        
+        Args:
+            node: Node identifier (device IP)
+            label: Node label
+            device_type: Device type string
+            device_data: Dictionary containing device information
             
-            net.add_edge(u, v, title=title)
+        Returns:
+            Node dictionary in the format pyvis passes to vis.js
+        """
+        # Build a title (tooltip) with more info
+        title = f"<b>{label}</b><br>"
+        title += f"IP: {node}<br>"
+        title += f"Type: {device_type}<br>"
+        if 'version' in device_data:
+            title += f"Version: {device_data['version']}<br>"
+        if 'hardware' in device_data:
+            title += f"Model: {device_data['hardware']}<br>"
+        
+        return {
+            'color': self.INTERACTIVE_COLOR_MAP.get(device_type, self.INTERACTIVE_COLOR_MAP['unknown']),
+            'title': title,
+            'id': node,
+            'label': label or node,
+            'shape': 'dot'
+        }
+    
+    def _build_edge(self, source: str, target: str,
+                    local_intf: str, remote_intf: str) -> Dict[str, Any]:
+        """
+        Build a vis.js edge for the interactive diagram.
         
-        # Configure physics
-        net.barnes_hut(spring_length=200)
+        Args:
+            source: Source node identifier
+            target: Target node identifier
+            local_intf: Interface on the source device
+            remote_intf: Interface on the target device
+            
+        Returns:
+            Edge dictionary in the format pyvis passes to vis.js
+        """
+        title = f"{local_intf} ⟷ {remote_intf}" if local_intf and remote_intf else ""
+        return {'title': title, 'from': source, 'to': target}
+    
+    def _write_interactive_html(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]],
+                                output_file: str) -> None:
+        """
+        Render the pyvis HTML template and write it to disk.
         
-        # Add filter control buttons
-        net.show_buttons(filter_=['physics'])
+        Renders the cached template directly rather than going through
+        pyvis.Network, whose add_node/add_edge do linear scans per call.
+        The vis.js assets the page references are copied next to it.
+        
+        Args:
+            nodes: Node dictionaries from _build_node()
+            edges: Edge dictionaries from _build_edge()
+            output_file: Path to save the output HTML file
+        """
+        html = _pyvis_template().render(height=_PYVIS_HEIGHT,
+                                        width=_PYVIS_WIDTH,
+                                        nodes=nodes,
+                                        edges=edges,
+                                        heading="",
+                                        options=_pyvis_options_json(),
+                                        physics_enabled=True,
+                                        use_DOT=False,
+                                        dot_lang="",
+                                        widget=True,
+                                        bgcolor="#ffffff",
+                                        conf=True,
+                                        tooltip_link=any('href' in node['title'] for node in nodes),
+                                        neighborhood_highlight=False,
+                                        select_menu=False,
+                                        filter_menu=False,
+                                        notebook=False,
+                                        cdn_resources="local")
         
         # Save the visualization
         directory = os.path.dirname(output_file)
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
-            
-        net.save_graph(output_file)
+        
+        lib_dir = os.path.join(directory, 'lib')
+        if not os.path.exists(lib_dir):
+            shutil.copytree(os.path.join(_PYVIS_TEMPLATE_DIR, 'lib'), lib_dir)
+        
+        with open(output_file, 'w') as f:
+            f.write(html)
         self.logger.info(f"Saved interactive diagram to {output_file}")
     
     def _apply_filters(self, filter_types: Optional[List[str]] = None) -> nx.Graph:
         """
-        Apply filters to the graph and return a filtered copy.
+        Apply filters to the graph and return a read-only filtered view.
         
         Args:
             filter_types: List of device types to include (None for all)
             
         Returns:
-            Filtered networkx graph
+            Filtered networkx graph (a view onto self.graph, not a copy)
         """
         if not filter_types:
-            return self.graph.copy()
+            return self.graph
         
-        # Create a subgraph with only the specified device types
-        filtered_nodes = [node for node, attr in self.graph.nodes(data=True) 
-                         if attr.get('device_type') in filter_types]
+        # Create a subgraph view with only the specified device types
+        filter_types_set = set(filter_types)
+        node_attrs = self.graph.nodes
         
-        return self.graph.subgraph(filtered_nodes).copy()
\ No newline at end of file
+        return nx.subgraph_view(self.graph,
+                                filter_node=lambda node: node_attrs[node].get('device_type') in filter_types_set)
@@ -5,16 +5,21 @@ Discovers network topology and generates diagrams.
 """
 
 import os
+import re
 import sys
 import yaml
 import logging
 import argparse
-from typing import Dict, List, Any, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Union
+import functools
 import ipaddress
+import pytricia
 from datetime import datetime
 
 from device_connector import DeviceConnector
-from data_parser import DataParser
+from data_parser import DataParser, compress_results
 from diagram_generator import DiagramGenerator
 from web_interface import WebInterface
 
@@ -24,12 +29,29 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler('network_discovery.log')
+        # Opened on the first record rather than at import
+        logging.FileHandler('network_discovery.log', delay=True)
     ]
 )
 
 logger = logging.getLogger(__name__)
 
+# Prefer the libyaml-backed C loader/dumper when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# Commands run on every discovered device
+DISCOVERY_COMMANDS = (
+    'show version',
+    'show cdp neighbors detail',
+    'show lldp neighbors detail',
+    'show interfaces',
+    'show ip interface brief',
+    'show vlan brief',
+    'show spanning-tree bridge',
+    'show ip route'
+)
+
 def load_device_list(file_path: str) -> List[Dict[str, Any]]:
     """
     Load the device list from a YAML file.
@@ -41,15 +63,89 @@ def load_device_list(file_path: str) -> List[Dict[str, Any]]:
         List of device dictionaries
     """
     try:
-        with open(file_path, 'r') as f:
-            devices = yaml.safe_load(f)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            devices = yaml.load(f, Loader=YAML_LOADER)
         return devices
     except Exception as e:
-        logger.error(f"Error loading device list from {file_path}: {str(e)}")
+        logger.error("Error loading device list from %s: %s", file_path, e)
         sys.exit(1)
 
+# Address shapes, to reject malformed entries before ipaddress raises on them
+_IPV4_RE = re.compile(r'(?:\d{1,3}\.){3}\d{1,3}')
+_IPV6_RE = re.compile(r'[0-9A-Fa-f:.]*:[0-9A-Fa-f:.]*(?:%\S+)?')
+
+@functools.lru_cache(maxsize=None)
+def _ip(address: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """
+    Parse an IP address once; neighbors are reported by many devices.
+    
+    Args:
+        address: IP address string
+        
+    Returns:
+        Parsed address, or None if the address is malformed
+    """
+    if isinstance(address, str) and not (_IPV4_RE.fullmatch(address) or _IPV6_RE.fullmatch(address)):
+        return None
+    try:
+        return ipaddress.ip_address(address)
+    except ValueError:
+        return None
+
+def build_ignore_trie(ignore_subnets: Optional[List[str]]) -> Dict[int, pytricia.PyTricia]:
+    """
+    Build prefix tries from the subnets to ignore during discovery.
+    
+    pytricia compares raw address bits, so IPv4 and IPv6 prefixes are kept
+    in separate tries to stop them matching addresses of the other family.
+    
+    Args:
+        ignore_subnets: List of subnet CIDRs to ignore
+        
+    Returns:
+        Dictionary mapping the IP version (4 or 6) to a trie of its subnets
+    """
+    ignore_trie = {4: pytricia.PyTricia(32), 6: pytricia.PyTricia(128)}
+    for subnet in ignore_subnets or []:
+        try:
+            network = ipaddress.ip_network(subnet)
+        except ValueError:
+            logger.warning("Invalid subnet format: %s", subnet)
+            continue
+        ignore_trie[network.version].insert(str(network), True)
+    return ignore_trie
+
+def _is_discoverable(device_ip: str, ignore_trie: Dict[int, pytricia.PyTricia]) -> bool:
+    """
+    Check that a device address is valid and not in an ignored subnet.
+    
+    Args:
+        device_ip: IP address of the device
+        ignore_trie: Tries of ignored subnets from build_ignore_trie()
+        
+    Returns:
+        True if the device should be discovered
+    """
+    # The address is validated first because pytricia rejects malformed
+    # keys unreliably
+    ip_addr = _ip(device_ip)
+    if ip_addr is None:
+        logger.warning("Invalid IP format: %s", device_ip)
+        return False
+    
+    # Look up the bare address: pytricia fails on an IPv6 scope suffix
+    try:
+        ignored = str(type(ip_addr)(int(ip_addr))) in ignore_trie[ip_addr.version]
+    except (ValueError, SystemError):
+        logger.warning("Invalid IP format: %s", device_ip)
+        return False
+    if ignored:
+        logger.info("Skipping %s as it's in an ignored subnet", device_ip)
+        return False
+    return True
+
 def discover_single_device(connector: DeviceConnector, parser: DataParser, 
-                          device_params: Dict[str, Any]) -> Dict[str, Any]:
+                          device_params: Dict[str, Any], keep_raw: bool = False) -> Dict[str, Any]:
     """
     Discover a single device and its neighbors.
     
@@ -57,12 +153,13 @@ def discover_single_device(connector: DeviceConnector, parser: DataParser,
         connector: DeviceConnector instance
         parser: DataParser instance
         device_params: Dictionary of device connection parameters
+        keep_raw: Whether to keep the compressed raw command outputs
         
     Returns:
         Dictionary of device information
     """
     device_ip = device_params.get('ip', 'unknown')
-    logger.info(f"Starting discovery for device: {device_ip}")
+    logger.info("Starting discovery for device: %s", device_ip)
     
     device_data = {
         'ip': device_ip,
@@ -72,23 +169,13 @@ def discover_single_device(connector: DeviceConnector, parser: DataParser,
     # Connect to the device
     connection = connector.connect(device_params)
     if not connection:
-        logger.error(f"Failed to connect to {device_ip}. Skipping...")
+        logger.error("Failed to connect to %s. Skipping...", device_ip)
         return device_data
     
     try:
         # Run discovery commands
-        commands = [
-            'show version',
-            'show cdp neighbors detail',
-            'show lldp neighbors detail',
-            'show interfaces',
-            'show ip interface brief',
-            'show vlan brief',
-            'show spanning-tree bridge',
-            'show ip route'
-        ]
-        
-        results = connector.execute_commands(connection, commands)
+        results = connector.execute_commands(connection, DISCOVERY_COMMANDS,
+                                             pace_seconds=device_params.get('inter_command_delay', 0))
         
         # Parse version information
         version_data = parser.parse_version(results.get('show version', ''))
@@ -100,16 +187,17 @@ def discover_single_device(connector: DeviceConnector, parser: DataParser,
         # Parse LLDP neighbors (and combine with CDP)
         lldp_neighbors = parser.parse_lldp_neighbors(results.get('show lldp neighbors detail', ''))
         
-        # Combine neighbors and remove duplicates based on IP
-        all_neighbors = cdp_neighbors.copy()
-        
-        # Track IPs to avoid duplicates
-        neighbor_ips = {n.get('ip') for n in all_neighbors if n.get('ip')}
+        # Combine neighbors, adding LLDP entries only for IPs CDP did not
+        # report. Every CDP entry is kept, as parallel links share an IP.
+        # The parser returns a fresh list, so it is extended in place.
+        all_neighbors = cdp_neighbors
+        neighbor_ips = {n.get('ip') for n in cdp_neighbors}
         
         for lldp_neighbor in lldp_neighbors:
-            if lldp_neighbor.get('ip') not in neighbor_ips:
+            neighbor_ip = lldp_neighbor.get('ip')
+            if neighbor_ip not in neighbor_ips:
                 all_neighbors.append(lldp_neighbor)
-                neighbor_ips.add(lldp_neighbor.get('ip'))
+                neighbor_ips.add(neighbor_ip)
         
         device_data['neighbors'] = all_neighbors
         
@@ -117,13 +205,15 @@ def discover_single_device(connector: DeviceConnector, parser: DataParser,
         interfaces = parser.parse_interfaces(results.get('show interfaces', ''))
         device_data['interfaces'] = interfaces
         
-        # Add the raw command results for reference/troubleshooting
-        device_data['raw_output'] = results
+        # Add the raw command results for reference/troubleshooting,
+        # compressed since they stay in memory for the whole discovery
+        if keep_raw:
+            device_data['raw_output'] = compress_results(results)
         
-        logger.info(f"Discovered {device_ip} with {len(all_neighbors)} neighbors")
+        logger.info("Discovered %s with %s neighbors", device_ip, len(all_neighbors))
         
     except Exception as e:
-        logger.error(f"Error discovering device {device_ip}: {str(e)}")
+        logger.error("Error discovering device %s: %s", device_ip, e)
     finally:
         connector.disconnect(connection)
     
@@ -131,7 +221,9 @@ def discover_single_device(connector: DeviceConnector, parser: DataParser,
 
 def discover_network(seed_devices: List[Dict[str, Any]], 
                     max_devices: int = 100, 
-                    ignore_subnets: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+                    ignore_subnets: Optional[List[str]] = None,
+                    max_workers: int = 32,
+                    keep_raw: bool = False) -> Dict[str, Dict[str, Any]]:
     """
     Discover the network topology starting from seed devices.
     
@@ -139,81 +231,84 @@ def discover_network(seed_devices: List[Dict[str, Any]],
         seed_devices: List of seed devices to start discovery from
         max_devices: Maximum number of devices to discover
         ignore_subnets: List of subnet CIDRs to ignore
+        max_workers: Maximum number of devices discovered concurrently
+        keep_raw: Whether to keep the compressed raw command outputs
         
     Returns:
         Dictionary mapping device IPs to their information
     """
-    logger.info(f"Starting network discovery with {len(seed_devices)} seed devices")
+    logger.info("Starting network discovery with %s seed devices", len(seed_devices))
     
     # Initialize components
     connector = DeviceConnector(logger)
     parser = DataParser(logger)
     
-    # Track discovered devices
-    discovered_devices = {}
-    discovery_queue = seed_devices.copy()
-    attempted_ips = set()
-    
     # Prepare ignore subnets
-    ignored_networks = []
-    if ignore_subnets:
-        for subnet in ignore_subnets:
-            try:
-                ignored_networks.append(ipaddress.ip_network(subnet))
-            except ValueError:
-                logger.warning(f"Invalid subnet format: {subnet}")
+    ignore_trie = build_ignore_trie(ignore_subnets)
+    
+    # Track discovered devices. Every IP is checked once, before it is
+    # queued, so the queue only ever holds devices still to discover.
+    discovered_devices = {}
+    discovery_queue = deque()
+    seen_ips = set()
     
-    # Process devices in the queue
-    while discovery_queue and len(discovered_devices) < max_devices:
-        device_params = discovery_queue.pop(0)
+    for device_params in seed_devices:
         device_ip = device_params.get('ip')
-        
-        if device_ip in attempted_ips:
-            continue
+        if device_ip not in seen_ips:
+            seen_ips.add(device_ip)
+            if _is_discoverable(device_ip, ignore_trie):
+                discovery_queue.append(device_params)
+    
+    try:
+        # Process the queue one BFS level at a time, discovering each level in parallel
+        while discovery_queue and len(discovered_devices) < max_devices:
+            frontier = []
+            while discovery_queue and len(discovered_devices) + len(frontier) < max_devices:
+                frontier.append(discovery_queue.popleft())
             
-        # Check if the device is in an ignored subnet
-        try:
-            ip_addr = ipaddress.ip_address(device_ip)
-            if any(ip_addr in network for network in ignored_networks):
-                logger.info(f"Skipping {device_ip} as it's in an ignored subnet")
-                attempted_ips.add(device_ip)
-                continue
-        except ValueError:
-            logger.warning(f"Invalid IP format: {device_ip}")
-            attempted_ips.add(device_ip)
-            continue
-        
-        # Discover the device
-        device_data = discover_single_device(connector, parser, device_params)
-        discovered_devices[device_ip] = device_data
-        attempted_ips.add(device_ip)
-        
-        # Process neighbors for recursive discovery
-        if 'neighbors' in device_data:
-            for neighbor in device_data['neighbors']:
-                neighbor_ip = neighbor.get('ip')
-                if (neighbor_ip and 
-                    neighbor_ip not in attempted_ips and 
-                    neighbor_ip not in [d.get('ip') for d in discovery_queue]):
-                    
-                    # Check if the neighbor is in an ignored subnet
-                    try:
-                        ip_addr = ipaddress.ip_address(neighbor_ip)
-                        if any(ip_addr in network for network in ignored_networks):
-                            logger.info(f"Skipping neighbor {neighbor_ip} as it's in an ignored subnet")
-                            continue
-                    except ValueError:
-                        logger.warning(f"Invalid neighbor IP format: {neighbor_ip}")
-                        continue
-                    
-                    # Add to discovery queue with same credentials as parent
-                    neighbor_params = device_params.copy()
-                    neighbor_params['ip'] = neighbor_ip
-                    discovery_queue.append(neighbor_params)
+            # Discover the devices; SSH sessions are I/O-bound, so threads overlap them
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(frontier)))) as executor:
+                results = list(executor.map(
+                    lambda params: discover_single_device(connector, parser, params, keep_raw), frontier))
+            
+            for device_params, device_data in zip(frontier, results):
+                discovered_devices[device_params.get('ip')] = device_data
+                
+                # Process neighbors for recursive discovery
+                for neighbor in device_data.get('neighbors', []):
+                    neighbor_ip = neighbor.get('ip')
+                    if neighbor_ip and neighbor_ip not in seen_ips:
+                        seen_ips.add(neighbor_ip)
+                        if _is_discoverable(neighbor_ip, ignore_trie):
+                            # Add to discovery queue with same credentials as parent
+                            neighbor_params = device_params.copy()
+                            neighbor_params['ip'] = neighbor_ip
+                            discovery_queue.append(neighbor_params)
+    finally:
+        # Close any sessions kept for reuse
+        connector.close_all()
     
-    logger.info(f"Discovery complete. Found {len(discovered_devices)} devices.")
+    logger.info("Discovery complete. Found %s devices.", len(discovered_devices))
     return discovered_devices
 
+def _positive_int(value: str) -> int:
+    """
+    Parse a command line value that must be a positive integer.
+    
+    Args:
+        value: Raw argument string
+        
+    Returns:
+        The parsed integer
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"must be an integer, got {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 def main():
     """Main function to run the network discovery tool."""
     parser = argparse.ArgumentParser(description='Cisco Network Discovery Tool')
@@ -225,6 +320,10 @@ def main():
                       help='Maximum number of devices to discover')
     parser.add_argument('--ignore-subnets', '-i', nargs='+',
                       help='Subnets to ignore during discovery (CIDR format)')
+    parser.add_argument('--workers', type=_positive_int, default=32,
+                      help='Maximum number of devices to discover concurrently')
+    parser.add_argument('--keep-raw', action='store_true',
+                      help='Keep compressed raw command outputs for the web API')
     parser.add_argument('--web', '-w', action='store_true',
                       help='Start web interface after discovery')
     parser.add_argument('--web-port', '-p', type=int, default=5000,
@@ -249,7 +348,9 @@ def main():
     devices = discover_network(
         seed_devices=seed_devices,
         max_devices=args.max_devices,
-        ignore_subnets=args.ignore_subnets
+        ignore_subnets=args.ignore_subnets,
+        max_workers=args.workers,
+        keep_raw=args.keep_raw
     )
     
     # Save discovery results
@@ -257,19 +358,18 @@ def main():
     discovery_file = os.path.join(args.output_dir, f'discovery_{timestamp}.yaml')
     
     try:
-        with open(discovery_file, 'w') as f:
-            # Remove raw output to keep file size manageable
-            clean_devices = {}
-            for ip, data in devices.items():
-                clean_data = data.copy()
-                if 'raw_output' in clean_data:
-                    del clean_data['raw_output']
-                clean_devices[ip] = clean_data
-                
-            yaml.dump(clean_devices, f, default_flow_style=False)
-        logger.info(f"Saved discovery results to {discovery_file}")
+        # Detach raw output to keep file size manageable, without copying
+        # every device dict; it is reattached for the diagram and web steps
+        raw_outputs = {ip: data.pop('raw_output') for ip, data in devices.items() if 'raw_output' in data}
+        try:
+            with open(discovery_file, 'w', encoding='utf-8') as f:
+                yaml.dump(devices, f, Dumper=YAML_DUMPER, default_flow_style=False, sort_keys=False)
+        finally:
+            for ip, raw_output in raw_outputs.items():
+                devices[ip]['raw_output'] = raw_output
+        logger.info("Saved discovery results to %s", discovery_file)
     except Exception as e:
-        logger.error(f"Error saving discovery results: {str(e)}")
+        logger.error("Error saving discovery results: %s", e)
     
     # Generate diagrams
     diagram_generator = DiagramGenerator(logger)
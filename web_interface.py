@@ -5,121 +5,19 @@ Provides a simple web UI for viewing and interacting with network diagrams.
 """
 
 import os
+import gzip
 import logging
-from typing import Dict, List, Any, Optional
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, jsonify
+from typing import Dict, List, Any, Optional, Tuple
+import orjson
+from jinja2 import ChoiceLoader, DictLoader, Template
+from flask import Flask, Response, request, stream_with_context, redirect, url_for, send_from_directory, jsonify
+from flask.json.provider import DefaultJSONProvider
+from waitress import serve
 
-class WebInterface:
-    """Creates a web interface for viewing and filtering network diagrams."""
-    
-    def __init__(self, output_dir: str, logger: Optional[logging.Logger] = None):
-        """
-        Initialize the web interface.
-        
-        Args:
-            output_dir: Directory where diagram files are stored
-            logger: Optional logger instance
-        """
-        self.logger = logger or logging.getLogger(__name__)
-        self.output_dir = output_dir
-        self.app = Flask(__name__)
-        self.device_data = {}
-        self.setup_routes()
-        
-    def setup_routes(self) -> None:
-        """Set up the Flask routes for the web interface."""
-        
-        @self.app.route('/')
-        def index():
-            """Main page displaying the network diagram."""
-            diagrams = self._get_available_diagrams()
-            device_types = self._get_device_types()
-            return render_template('index.html', 
-                                 diagrams=diagrams,
-                                 device_types=device_types)
-        
-        @self.app.route('/diagrams/<path:filename>')
-        def serve_diagram(filename):
-            """Serve diagram files."""
-            return send_from_directory(self.output_dir, filename)
-        
-        @self.app.route('/api/devices')
-        def get_devices():
-            """API endpoint to get device data."""
-            return jsonify(self.device_data)
-        
-        @self.app.route('/api/filter', methods=['POST'])
-        def filter_devices():
-            """API endpoint to filter devices by type."""
-            filter_types = request.json.get('types', [])
-            # Logic to regenerate diagram with filters would go here
-            return jsonify({'success': True, 'filter_applied': filter_types})
-    
-    def _get_available_diagrams(self) -> List[Dict[str, str]]:
-        """
-        Get list of available diagram files.
-        
-        Returns:
-            List of dictionaries with diagram information
-        """
-        diagrams = []
-        if os.path.exists(self.output_dir):
-            for filename in os.listdir(self.output_dir):
-                if filename.endswith('.html'):
-                    diagrams.append({
-                        'name': filename.replace('.html', ''),
-                        'path': filename,
-                        'type': 'interactive'
-                    })
-                elif filename.endswith(('.png', '.jpg', '.svg')):
-                    diagrams.append({
-                        'name': filename.replace(''.join(['.', filename.split('.')[-1]]), ''),
-                        'path': filename,
-                        'type': 'static'
-                    })
-        return diagrams
-    
-    def _get_device_types(self) -> List[str]:
-        """
-        Get unique device types from the data.
-        
-        Returns:
-            List of device type strings
-        """
-        device_types = set()
-        for device in self.device_data.values():
-            device_types.add(device.get('device_type', 'unknown'))
-        return list(device_types)
-    
-    def set_device_data(self, data: Dict[str, Dict[str, Any]]) -> None:
-        """
-        Set the device data for the web interface.
-        
-        Args:
-            data: Dictionary of device data
-        """
-        self.device_data = data
-    
-    def run(self, host: str = '0.0.0.0', port: int = 5000, debug: bool = False) -> None:
-        """
-        Run the web interface.
-        
-        Args:
-            host: Host address to bind to
-            port: Port to listen on
-            debug: Whether to run in debug mode
-        """
-        # Create templates directory and index.html if they don't exist
-        templates_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
-        if not os.path.exists(templates_dir):
-            os.makedirs(templates_dir)
-            
-        # Create a basic index.html template if it doesn't exist
-        index_path = os.path.join(templates_dir, 'index.html')
-        if not os.path.exists(index_path):
-            with open(index_path, 'w') as f:
-                f.write("""
-<!DOCTYPE html>
+from data_parser import decompress_results
+
+# Template for the main page, served from memory
+INDEX_HTML = """<!DOCTYPE html>
 <html>
 <head>
     <title>Network Topology Viewer</title>
@@ -235,7 +133,221 @@ class WebInterface:
     </script>
 </body>
 </html>
-                """)
+"""
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson instead of json."""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as a JSON string."""
+        return self._dumps_bytes(obj, indent='indent' in kwargs).decode('utf-8')
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Serialize data into a JSON response without an intermediate str."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._dumps_bytes(obj, indent) + b'\n',
+                                        mimetype=self.mimetype)
+    
+    def _dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        """
+        Serialize data to JSON bytes with orjson.
         
-        self.logger.info(f"Starting web interface on http://{host}:{port}")
-        self.app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+        Args:
+            obj: The data to serialize
+            indent: Whether to pretty-print the output
+            
+        Returns:
+            UTF-8 encoded JSON
+        """
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+class WebInterface:
+    """Creates a web interface for viewing and filtering network diagrams."""
+    
+    # Seconds browsers may cache served diagram files
+    DIAGRAM_MAX_AGE = 3600
+    
+    # Worker threads for the production WSGI server
+    WSGI_THREADS = 8
+    
+    # Endpoints whose responses are gzipped, and the smallest body worth it
+    GZIP_ENDPOINTS = ('get_devices',)
+    GZIP_MIN_SIZE = 1024
+    
+    def __init__(self, output_dir: str, logger: Optional[logging.Logger] = None):
+        """
+        Initialize the web interface.
+        
+        Args:
+            output_dir: Directory where diagram files are stored
+            logger: Optional logger instance
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.output_dir = output_dir
+        self.app = Flask(__name__)
+        self.app.json = OrjsonProvider(self.app)
+        self.app.jinja_loader = ChoiceLoader([DictLoader({'index.html': INDEX_HTML}),
+                                              self.app.jinja_loader])
+        self.device_data = {}
+        self._device_types: List[str] = []
+        self._diagrams_cache: Optional[Tuple[int, List[Dict[str, str]]]] = None
+        self._template: Template = self.app.jinja_env.get_template('index.html')
+        self.setup_routes()
+        
+    def setup_routes(self) -> None:
+        """Set up the Flask routes for the web interface."""
+        
+        @self.app.route('/')
+        def index():
+            """Main page displaying the network diagram."""
+            context = {
+                'diagrams': self._get_available_diagrams(),
+                'device_types': self._get_device_types()
+            }
+            self.app.update_template_context(context)
+            return self.app.response_class(
+                stream_with_context(self._template.generate(context)),
+                mimetype='text/html')
+        
+        @self.app.route('/diagrams/<path:filename>')
+        def serve_diagram(filename):
+            """Serve diagram files."""
+            return send_from_directory(self.output_dir, filename, max_age=self.DIAGRAM_MAX_AGE)
+        
+        @self.app.route('/api/devices')
+        def get_devices():
+            """API endpoint to get device data."""
+            return jsonify({ip: self._expand_raw_output(device)
+                            for ip, device in self.device_data.items()})
+        
+        @self.app.after_request
+        def compress_response(response):
+            """Gzip large API responses for clients that accept it."""
+            return self._gzip_response(response)
+        
+        @self.app.route('/api/filter', methods=['POST'])
+        def filter_devices():
+            """API endpoint to filter devices by type."""
+            filter_types = request.json.get('types', [])
+            # Logic to regenerate diagram with filters would go here
+            return jsonify({'success': True, 'filter_applied': filter_types})
+    
+    def _gzip_response(self, response: Response) -> Response:
+        """
+        Compress a response body with gzip when worthwhile.
+        
+        Args:
+            response: Response produced by a view
+            
+        Returns:
+            The response, compressed in place if it qualified
+        """
+        if (request.endpoint not in self.GZIP_ENDPOINTS or
+                response.direct_passthrough or response.is_streamed or
+                'Content-Encoding' in response.headers or
+                request.accept_encodings['gzip'] <= 0):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < self.GZIP_MIN_SIZE:
+            return response
+        
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+    
+    def _expand_raw_output(self, device: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decompress a device's raw command outputs for serialization.
+        
+        Args:
+            device: Device data, possibly holding compressed raw output
+            
+        Returns:
+            The device data, copied with readable raw output if it had any
+        """
+        if 'raw_output' not in device:
+            return device
+        expanded = dict(device)
+        expanded['raw_output'] = decompress_results(device['raw_output'])
+        return expanded
+    
+    def _get_available_diagrams(self) -> List[Dict[str, str]]:
+        """
+        Get list of available diagram files.
+        
+        The listing is cached and only rebuilt when the output directory's
+        modification time changes, i.e. when files are added or removed.
+        
+        Returns:
+            List of dictionaries with diagram information
+        """
+        try:
+            dir_mtime = os.stat(self.output_dir).st_mtime_ns
+        except OSError:
+            return []
+        
+        if self._diagrams_cache is not None and self._diagrams_cache[0] == dir_mtime:
+            return self._diagrams_cache[1]
+        
+        diagrams = []
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                name, extension = os.path.splitext(entry.name)
+                if extension == '.html':
+                    diagrams.append({
+                        'name': name,
+                        'path': entry.name,
+                        'type': 'interactive'
+                    })
+                elif extension in ('.png', '.jpg', '.svg'):
+                    diagrams.append({
+                        'name': name,
+                        'path': entry.name,
+                        'type': 'static'
+                    })
+        
+        self._diagrams_cache = (dir_mtime, diagrams)
+        return diagrams
+    
+    def _get_device_types(self) -> List[str]:
+        """
+        Get unique device types from the data.
+        
+        Returns:
+            Sorted list of device type strings, computed in set_device_data
+        """
+        return self._device_types
+    
+    def set_device_data(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Set the device data for the web interface.
+        
+        Args:
+            data: Dictionary of device data
+        """
+        self.device_data = data
+        self._device_types = sorted({device.get('device_type', 'unknown') for device in data.values()})
+    
+    def run(self, host: str = '0.0.0.0', port: int = 5000, debug: bool = False) -> None:
+        """
+        Run the web interface.
+        
+        Args:
+            host: Host address to bind to
+            port: Port to listen on
+            debug: Whether to run in debug mode
+        """
+        self.logger.info("Starting web interface on http://%s:%s", host, port)
+        if debug:
+            # Werkzeug's development server, for the reloader and debugger
+            self.app.run(host=host, port=port, debug=debug)
+        else:
+            serve(self.app, host=host, port=port, threads=self.WSGI_THREADS)
\ No newline at end of file